@@ -3,6 +3,19 @@ import json
 import logging
 from pathlib import Path
 import argparse
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterator, Mapping, Tuple
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Set up logging
 logging.basicConfig(
@@ -18,21 +31,42 @@ TRACKING_DIR = os.getenv('TRACKING_DIR', str(BASE_DIR / 'data' / 'tracking'))
 FILE_SIZES_FILE = os.path.join(TRACKING_DIR, 'file_sizes.json')
 DOWNLOADED_FILE = os.path.join(TRACKING_DIR, 'downloaded.txt')
 
-def get_expected_sizes() -> dict:
+@lru_cache(maxsize=4)
+def _load_sizes(path: str, mtime_ns: int) -> Mapping[str, int]:
+    """Parse a file sizes JSON file; cached until its mtime changes.
+
+    With ijson the file is parsed as a stream rather than read into one
+    bytes buffer first. The cached mapping is shared, so it is read-only.
+    """
+    with open(path, 'rb') as f:
+        if ijson is not None:
+            sizes = dict(ijson.kvitems(f, ''))
+        else:
+            sizes = json_loads(f.read())
+    return MappingProxyType(sizes)
+
+def get_expected_sizes() -> Mapping[str, int]:
     """Get expected file sizes from the JSON file."""
-    if not os.path.exists(FILE_SIZES_FILE):
+    try:
+        mtime_ns = os.stat(FILE_SIZES_FILE).st_mtime_ns
+    except FileNotFoundError:
         logger.error(f"File sizes JSON not found at {FILE_SIZES_FILE}")
-        return {}
+        return MappingProxyType({})
     
     try:
-        with open(FILE_SIZES_FILE, 'r') as f:
-            return json.load(f)
+        return _load_sizes(FILE_SIZES_FILE, mtime_ns)
     except json.JSONDecodeError as e:
         logger.error(f"Error reading JSON file: {str(e)}")
-        return {}
     except Exception as e:
-        logger.error(f"Unexpected error reading file sizes: {str(e)}")
-        return {}
+        if ijson is not None and isinstance(e, ijson.JSONError):
+            logger.error(f"Error reading JSON file: {str(e)}")
+        else:
+            logger.error(f"Unexpected error reading file sizes: {str(e)}")
+    return MappingProxyType({})
+
+def iter_expected_sizes() -> Iterator[Tuple[str, int]]:
+    """Iterate (filename, size) pairs from the cached file sizes."""
+    return iter(get_expected_sizes().items())
 
 def get_downloaded_files() -> list:
     """Get list of files from downloaded.txt."""
@@ -41,41 +75,58 @@ def get_downloaded_files() -> list:
         return []
     
     try:
-        with open(DOWNLOADED_FILE, 'r') as f:
-            return [line.strip() for line in f if line.strip()]
+        with open(DOWNLOADED_FILE, 'rb') as f:
+            data = f.read().decode('utf-8', 'replace')
+        return [line for line in map(str.strip, data.splitlines()) if line]
     except Exception as e:
         logger.error(f"Error reading downloaded files list: {str(e)}")
         return []
 
 def check_file_sizes():
     """Check actual file sizes against expected sizes for downloaded files."""
-    expected_sizes = get_expected_sizes()
     downloaded_files = get_downloaded_files()
     
-    if not expected_sizes:
-        logger.error("No expected sizes found, cannot proceed with check")
-        return
-    
     if not downloaded_files:
         logger.error("No downloaded files found in list, cannot proceed with check")
         return
 
+    # Only keep the sizes we will actually look up, but count them all so a
+    # missing or empty JSON is told apart from one without these files
+    downloaded_set = frozenset(downloaded_files)
+    expected_sizes = {}
+    total_sizes = 0
+    for name, size in iter_expected_sizes():
+        total_sizes += 1
+        if name in downloaded_set:
+            expected_sizes[name] = size
+    
+    if not total_sizes:
+        logger.error("No expected sizes found, cannot proceed with check")
+        return
+
     logger.info(f"Found {len(downloaded_files)} files in downloaded list")
+
+    # Stat the whole download directory in one pass
+    try:
+        with os.scandir(DOWNLOAD_DIR) as entries:
+            sizes_on_disk = {e.name: e.stat().st_size for e in entries if e.is_file()}
+    except OSError as e:
+        logger.error(f"Error reading download directory {DOWNLOAD_DIR}: {str(e)}")
+        return
     
-    # Check each downloaded file
-    for filename in downloaded_files:
-        if filename not in expected_sizes:
-            logger.warning(f"No expected size found for {filename}")
-            continue
-            
+    # expected_sizes only holds downloaded names, so its keys are the intersection
+    for filename in sorted(downloaded_set - expected_sizes.keys()):
+        logger.warning(f"No expected size found for {filename}")
+    
+    # Check each downloaded file that has an expected size
+    for filename in sorted(expected_sizes):
         expected_size = expected_sizes[filename]
-        file_path = os.path.join(DOWNLOAD_DIR, filename)
+        actual_size = sizes_on_disk.get(filename)
         
-        if not os.path.exists(file_path):
+        if actual_size is None:
             logger.warning(f"File not found: {filename}")
             continue
             
-        actual_size = os.path.getsize(file_path)
         if actual_size != expected_size:
             logger.warning(
                 f"Size mismatch for {filename}:\n"
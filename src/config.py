@@ -8,7 +8,8 @@ if not FIREFLIES_API_KEY:
     raise ValueError("FIREFLIES_API_KEY not found in environment variables")
 
 class Config:
+    FIREFLIES_API_KEY = FIREFLIES_API_KEY
     DOWNLOAD_DIR = os.getenv('DOWNLOAD_DIR', '/data/videos')
     TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', '/data/transcripts')
     TRACKING_DIR = os.getenv('TRACKING_DIR', '/data/tracking')
-    WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base') 
\ No newline at end of file
+    WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
\ No newline at end of file
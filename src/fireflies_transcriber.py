@@ -1,36 +1,93 @@
 import os
 import re
+import random
 import asyncio
-from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, ClassVar, Dict, Optional
 from gql import Client, gql
+from graphql import DocumentNode
 from gql.transport.aiohttp import AIOHTTPTransport
-from dotenv import load_dotenv
+from config import Config
+
+# Matches the file ID in /file/d/<id> and ?id=<id> style Google Drive URLs
+_DRIVE_ID_RE = re.compile(r'(?:/file/d/|[?&]id=)([a-zA-Z0-9_-]+)')
+
+MAX_CONCURRENT_FILES = 8  # Files processed in parallel by process_files
+
+# Transcript polling
+TRANSCRIPT_TIMEOUT = 300  # 5 minutes total
+POLL_INITIAL_DELAY = 2.0
+POLL_MAX_DELAY = 30.0
 
 class FirefliesTranscriber:
+    # GraphQL documents, parsed once when the class is defined
+    _UPLOAD_M: ClassVar[DocumentNode] = gql("""
+        mutation UploadAudio($input: AudioUploadInput!) {
+            uploadAudio(input: $input) {
+                success
+                title
+                message
+            }
+        }
+    """)
+
+    _GET_Q: ClassVar[DocumentNode] = gql("""
+        query GetTranscript($title: String!) {
+            transcripts(filter: { title: $title }) {
+                text
+            }
+        }
+    """)
+
     def __init__(self):
-        load_dotenv()
-        self.api_key = os.getenv('FIREFLIES_API_KEY')
-        if not self.api_key:
-            raise ValueError("FIREFLIES_API_KEY not found in environment variables")
-        
-        # Initialize GraphQL client
-        transport = AIOHTTPTransport(
-            url='https://api.fireflies.ai/graphql',
-            headers={'Authorization': f'Bearer {self.api_key}'}
-        )
-        self.client = Client(transport=transport, fetch_schema_from_transport=True)
+        # config.py loads .env once and validates the API key at import
+        self.api_key = Config.FIREFLIES_API_KEY
+        # This instance's GraphQL client, created on first use
+        self._client: Optional[Client] = None
+        # Connected session shared by concurrent queries, open while
+        # _session_users > 0
+        self._session = None
+        self._session_users = 0
+        self._session_lock = asyncio.Lock()
+
+    def _get_client(self) -> Client:
+        """Get this instance's GraphQL client, creating it on first use."""
+        if self._client is None:
+            transport = AIOHTTPTransport(
+                url='https://api.fireflies.ai/graphql',
+                headers={'Authorization': f'Bearer {self.api_key}'}
+            )
+            self._client = Client(transport=transport, fetch_schema_from_transport=False)
+        return self._client
+
+    @asynccontextmanager
+    async def _connected(self):
+        """Keep one session open for as long as any caller is using it."""
+        # A gql Client can only be connected once, so overlapping callers
+        # share the session and the last one out closes it
+        async with self._session_lock:
+            if self._session_users == 0:
+                self._session = await self._get_client().connect_async()
+            self._session_users += 1
+        try:
+            yield self._session
+        finally:
+            async with self._session_lock:
+                self._session_users -= 1
+                if self._session_users == 0:
+                    self._session = None
+                    await self._client.close_async()
+
+    async def _execute(self, document: DocumentNode, variables: Dict[str, Any]) -> Dict:
+        """Execute a GraphQL document on this instance's shared session."""
+        async with self._connected() as session:
+            return await session.execute(document, variable_values=variables)
 
     def _extract_file_id(self, url: str) -> str:
         """Extract file ID from Google Drive URL."""
-        patterns = [
-            r'/file/d/([a-zA-Z0-9_-]+)',
-            r'[?&]id=([a-zA-Z0-9_-]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        match = _DRIVE_ID_RE.search(url)
+        if match:
+            return match.group(1)
         
         raise ValueError("Invalid Google Drive URL format")
 
@@ -42,16 +99,6 @@ class FirefliesTranscriber:
 
     async def upload_audio(self, file_url: str, title: str) -> Dict:
         """Upload an audio file for transcription."""
-        mutation = gql("""
-            mutation UploadAudio($input: AudioUploadInput!) {
-                uploadAudio(input: $input) {
-                    success
-                    title
-                    message
-                }
-            }
-        """)
-        
         variables = {
             "input": {
                 "url": file_url,
@@ -59,21 +106,16 @@ class FirefliesTranscriber:
             }
         }
         
-        result = await self.client.execute_async(mutation, variable_values=variables)
+        result = await self._execute(self._UPLOAD_M, variables)
         return result['uploadAudio']
 
     async def get_transcript(self, title: str) -> Dict:
         """Get transcript for a meeting by title."""
-        query = gql("""
-            query GetTranscript($title: String!) {
-                transcripts(filter: { title: $title }) {
-                    text
-                }
-            }
-        """)
-        
-        variables = {"title": title}
-        result = await self.client.execute_async(query, variable_values=variables)
+        return await self._query_transcript({"title": title})
+
+    async def _query_transcript(self, variables: Dict[str, Any]) -> Dict:
+        """Run the transcript query with prebuilt variables."""
+        result = await self._execute(self._GET_Q, variables)
         return result['transcripts'][0] if result['transcripts'] else None
 
     async def process_file(self, file_url: str, title: Optional[str] = None) -> Dict:
@@ -94,20 +136,38 @@ class FirefliesTranscriber:
         # Wait a bit for processing to start
         await asyncio.sleep(5)
         
-        # Try to get the transcript
-        max_attempts = 30  # 5 minutes total with 10-second intervals
-        for attempt in range(max_attempts):
-            transcript = await self.get_transcript(title)
+        # Poll for the transcript with jittered exponential backoff
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TRANSCRIPT_TIMEOUT
+        delay = POLL_INITIAL_DELAY
+        variables = {"title": title}  # Reused across polling attempts
+        while True:
+            transcript = await self._query_transcript(variables)
             if transcript:
                 return transcript
-            await asyncio.sleep(10)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(delay + random.uniform(0, delay * 0.1), remaining))
+            delay = min(delay * 1.5, POLL_MAX_DELAY)
         
         raise TimeoutError("Transcription timed out")
 
     async def process_files(self, file_urls: list[str]) -> list[Dict]:
-        """Process multiple files."""
-        results = []
-        for url in file_urls:
-            result = await self.process_file(url)
-            results.append(result)
-        return results 
\ No newline at end of file
+        """Process multiple files concurrently.
+
+        Results are returned in input order; a file that fails yields its
+        exception instead of a transcript.
+        """
+        sem = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+
+        async def process_one(url: str) -> Dict:
+            async with sem:
+                return await self.process_file(url)
+
+        # All concurrent queries go through one connected session
+        async with self._connected():
+            return await asyncio.gather(
+                *(process_one(url) for url in file_urls),
+                return_exceptions=True
+            ) 
\ No newline at end of file
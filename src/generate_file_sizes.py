@@ -6,6 +6,11 @@ import logging
 from pathlib import Path
 from typing import Dict, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +23,8 @@ BASE_DIR = Path(__file__).parent.parent
 TRACKING_DIR = os.getenv('TRACKING_DIR', str(BASE_DIR / 'data' / 'tracking'))
 DOWNLOAD_LIST_FILE = os.path.join(TRACKING_DIR, 'download_list.txt')
 FILE_SIZES_FILE = os.path.join(TRACKING_DIR, 'file_sizes.json')
+MAX_CONCURRENT_REQUESTS = 64  # Parallel HEAD requests
+MAX_REQUESTS_PER_HOST = 16  # Pooled connections per host
 
 async def get_file_size(url: str, session: aiohttp.ClientSession) -> Optional[int]:
     """Get file size from HEAD request."""
@@ -44,28 +51,44 @@ async def main():
     os.makedirs(TRACKING_DIR, exist_ok=True)
     
     # Read download list
-    with open(DOWNLOAD_LIST_FILE, 'r') as f:
-        urls = [line.strip() for line in f if line.strip()]
+    with open(DOWNLOAD_LIST_FILE, 'rb') as f:
+        data = f.read().decode('utf-8', 'replace')
+    urls = [line for line in map(str.strip, data.splitlines()) if line]
     
     logger.info(f"Found {len(urls)} URLs to process")
     
     # Get file sizes
     file_sizes: Dict[str, int] = {}
     timeout = aiohttp.ClientTimeout(total=30)  # 30 second timeout for HEAD requests
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT_REQUESTS,
+        limit_per_host=MAX_REQUESTS_PER_HOST,
+        ttl_dns_cache=300,
+        keepalive_timeout=60
+    )
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
     
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        for url in urls:
-            filename = get_filename(url)
-            size = await get_file_size(url, session)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async def fetch_size(url: str):
+            async with sem:
+                return get_filename(url), await get_file_size(url, session)
+        
+        results = await asyncio.gather(*(fetch_size(url) for url in urls))
+        for filename, size in results:
             if size:
                 file_sizes[filename] = size
                 logger.info(f"Got size for {filename}: {size} bytes")
             else:
                 logger.warning(f"Could not get size for {filename}")
     
-    # Save to JSON file
-    with open(FILE_SIZES_FILE, 'w') as f:
-        json.dump(file_sizes, f, indent=2)
+    # Save to JSON file atomically so readers never see a partial write
+    tmp_file = f"{FILE_SIZES_FILE}.tmp"
+    with open(tmp_file, 'wb') as f:
+        if orjson is not None:
+            f.write(orjson.dumps(file_sizes))
+        else:
+            f.write(json.dumps(file_sizes, separators=(',', ':')).encode('utf-8'))
+    os.replace(tmp_file, FILE_SIZES_FILE)
     
     logger.info(f"Saved {len(file_sizes)} file sizes to {FILE_SIZES_FILE}")
 
@@ -1,6 +1,8 @@
 import os
 import asyncio
 import aiohttp
+import aiofiles
+from aiohttp.resolver import AsyncResolver, ThreadedResolver
 import logging
 from pathlib import Path
 import sys
@@ -9,6 +11,10 @@ import traceback
 import time
 from typing import Optional, Set, Dict
 import json
+import random
+import ctypes
+import ctypes.util
+from contextlib import nullcontext
 
 # Set up logging
 logging.basicConfig(
@@ -18,51 +24,85 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Constants - will be overridden by environment variables if set
-DOWNLOAD_DIR = os.getenv('DOWNLOAD_DIR', '/data/videos')
+# Trailing slash stripped so per-file paths can be built with f-strings
+DOWNLOAD_DIR = os.getenv('DOWNLOAD_DIR', '/data/videos').rstrip('/')
 TRACKING_DIR = os.getenv('TRACKING_DIR', '/data/tracking')
 DOWNLOADED_FILE = os.path.join(TRACKING_DIR, 'downloaded.txt')
 DOWNLOAD_LIST_FILE = os.path.join(TRACKING_DIR, 'download_list.txt')
 FILE_SIZES_FILE = os.path.join(TRACKING_DIR, 'file_sizes.json')
+URL_PREFIXES = ('http://', 'https://')
 
 # Download configuration
 DOWNLOAD_TIMEOUT = 14400  # 4 hours
 CHUNK_TIMEOUT = 1800  # 30 minutes per chunk
 MAX_RETRIES = 5
-RETRY_DELAY = 300  # 5 minutes between retries
+RETRY_DELAY = 300  # 5 minutes base delay between retries
+RETRY_CAP = 900  # Upper bound on any single retry delay
 MAX_CONCURRENT_DOWNLOADS = 2  # Reduced to 2 concurrent downloads
 CHUNK_SIZE = 1024 * 1024  # 1MB chunks
-RATE_LIMIT_DELAY = 60  # 1 minute delay between initial requests
-MAX_CONCURRENT_REQUESTS = 1  # Rate limit the initial HEAD requests
+READ_BUFSIZE = 10 * 1024 * 1024  # 10MB socket read buffer per response
+MAX_CONCURRENT_REQUESTS = 10  # Parallel HEAD requests per host
+DNS_CACHE_TTL = 3600  # Seconds to cache resolved hosts
+HEAD_TIMEOUT = aiohttp.ClientTimeout(total=30)  # 30 second timeout for HEAD requests
+
+# Preflight connectivity check
+CONNECTIVITY_HOST = 'wccdownload.on24.com'
+PING_TIMEOUT = 10  # Seconds to wait for ping to finish
 
 # Speed monitoring
 SPEED_CHECK_INTERVAL = 60  # Check speed every minute
 MIN_SPEED_BYTES_PER_SECOND = 1024  # 1KB/s minimum speed
+PROGRESS_LOG_INTERVAL = 1.0  # Minimum seconds between progress log lines
+
+# fallocate(2) mode flag: reserve blocks without changing the file size
+FALLOC_FL_KEEP_SIZE = 0x01
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _fallocate = getattr(_libc, 'fallocate64', None) or _libc.fallocate
+    _fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong)
+except (OSError, AttributeError):
+    _fallocate = None  # Not Linux/glibc-compatible, skip preallocation
+
+class RetryableDownloadError(Exception):
+    """A download attempt failed in a way that may succeed on retry."""
+
+class StaleSizeError(RetryableDownloadError):
+    """The expected size no longer matches the server; re-check it before retrying."""
+
+# In-memory copy of downloaded.txt, loaded on first use
+_DOWNLOADED: Optional[Set[str]] = None
+# Set when entries were removed and downloaded.txt needs rewriting
+_DOWNLOADED_DIRTY = False
+# Append handle for downloaded.txt, held open for the duration of download_videos
+_DOWNLOADED_LOG = None
 
 async def check_network_connectivity():
     """Check if network connectivity is working"""
     try:
-        # Check DNS resolution
+        # Check DNS resolution in-process rather than spawning nslookup
         logger.info("Checking DNS resolution...")
-        result = await asyncio.create_subprocess_exec(
-            'nslookup', 'wccdownload.on24.com',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await result.communicate()
-        if result.returncode == 0:
+        try:
+            await asyncio.get_running_loop().getaddrinfo(CONNECTIVITY_HOST, None)
             logger.info("DNS resolution working")
-        else:
-            logger.error(f"DNS resolution failed: {stderr.decode()}")
+        except OSError as e:
+            logger.error(f"DNS resolution failed: {str(e)}")
             return False
 
         # Check network connectivity with ping to on24
         logger.info("Checking network connectivity to on24...")
         result = await asyncio.create_subprocess_exec(
-            'ping', '-c', '4', 'wccdownload.on24.com',
+            'ping', '-c', '4', CONNECTIVITY_HOST,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
-        stdout, stderr = await result.communicate()
+        try:
+            stdout, stderr = await asyncio.wait_for(result.communicate(), timeout=PING_TIMEOUT)
+        except asyncio.TimeoutError:
+            result.kill()
+            await result.wait()
+            logger.error(f"Network connectivity check timed out after {PING_TIMEOUT} seconds")
+            return False
         if result.returncode == 0:
             logger.info("Network connectivity working")
             logger.info(f"Ping results: {stdout.decode()}")
@@ -75,12 +115,52 @@ async def check_network_connectivity():
         logger.error(f"Network check failed: {str(e)}")
         return False
 
+def make_connector(**kwargs) -> aiohttp.TCPConnector:
+    """Create a TCPConnector with an async DNS resolver and a long-lived DNS cache."""
+    try:
+        resolver = AsyncResolver()
+    except RuntimeError:  # aiodns is not installed
+        resolver = ThreadedResolver()
+    return aiohttp.TCPConnector(
+        resolver=resolver,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        **kwargs
+    )
+
+def retry_backoff(retry_count: int) -> float:
+    """Get a full-jitter exponential backoff delay for the given retry."""
+    return random.uniform(0, min(RETRY_DELAY * (2 ** retry_count), RETRY_CAP))
+
 def get_downloaded_files() -> Set[str]:
     """Get set of already downloaded files."""
-    if not os.path.exists(DOWNLOADED_FILE):
-        return set()
-    with open(DOWNLOADED_FILE, 'r') as f:
-        return {line.strip() for line in f if line.strip()}
+    global _DOWNLOADED
+    if _DOWNLOADED is None:
+        if os.path.exists(DOWNLOADED_FILE):
+            with open(DOWNLOADED_FILE, 'r') as f:
+                _DOWNLOADED = {line.strip() for line in f if line.strip()}
+        else:
+            _DOWNLOADED = set()
+    return _DOWNLOADED
+
+def unmark_downloaded(filename: str) -> None:
+    """Remove a file from the downloaded set; the file is rewritten on save."""
+    global _DOWNLOADED_DIRTY
+    downloaded_files = get_downloaded_files()
+    if filename in downloaded_files:
+        downloaded_files.discard(filename)
+        _DOWNLOADED_DIRTY = True
+
+def save_downloaded_files() -> None:
+    """Atomically rewrite downloaded.txt if entries were removed."""
+    global _DOWNLOADED_DIRTY
+    if not _DOWNLOADED_DIRTY:
+        return
+    tmp_file = f"{DOWNLOADED_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.writelines(f"{name}\n" for name in sorted(get_downloaded_files()))
+    os.replace(tmp_file, DOWNLOADED_FILE)
+    _DOWNLOADED_DIRTY = False
 
 def get_expected_sizes() -> Dict[str, int]:
     """Get expected file sizes from the JSON file."""
@@ -89,32 +169,65 @@ def get_expected_sizes() -> Dict[str, int]:
     with open(FILE_SIZES_FILE, 'r') as f:
         return json.load(f)
 
+def save_expected_sizes(file_sizes: Dict[str, int]) -> None:
+    """Atomically write expected file sizes to the JSON file."""
+    tmp_file = f"{FILE_SIZES_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(file_sizes, f)
+    os.replace(tmp_file, FILE_SIZES_FILE)
+
+def set_expected_size(filename: str, size: Optional[int]) -> None:
+    """Update or, with size None, drop one file's entry in the sizes JSON file."""
+    file_sizes = get_expected_sizes()
+    if size is None:
+        if file_sizes.pop(filename, None) is None:
+            return
+    else:
+        file_sizes[filename] = size
+    save_expected_sizes(file_sizes)
+
 def is_url(path):
     """Check if the path is a URL."""
-    return path.startswith(('http://', 'https://'))
+    return path.startswith(URL_PREFIXES)
 
 def get_filename(path):
     """Extract filename from URL or path."""
     if is_url(path):
-        return path.split('/')[-1]
+        return path.rsplit('/', 1)[-1]
     return os.path.basename(path)
 
-def mark_as_downloaded(filename):
+async def mark_as_downloaded(filename):
     """Mark a file as downloaded."""
-    with open(DOWNLOADED_FILE, 'a') as f:
-        f.write(f"{filename}\n")
+    if _DOWNLOADED_LOG is not None:
+        await _DOWNLOADED_LOG.write(f"{filename}\n")
+        await _DOWNLOADED_LOG.flush()
+    else:
+        async with aiofiles.open(DOWNLOADED_FILE, 'a') as f:
+            await f.write(f"{filename}\n")
+    get_downloaded_files().add(filename)
 
 def is_file_complete(filename: str, expected_size: int) -> bool:
     """Check if a file is completely downloaded."""
-    file_path = os.path.join(DOWNLOAD_DIR, filename)
+    file_path = f"{DOWNLOAD_DIR}/{filename}"
     if not os.path.exists(file_path):
         return False
     return os.path.getsize(file_path) == expected_size
 
+def preallocate(fd: int, offset: int, length: int) -> None:
+    """
+    Reserve disk blocks for a file region without changing its visible size.
+    
+    st_size keeps tracking the bytes actually written, so a download killed
+    mid-way (docker stop, OOM) can still be resumed from its size.
+    """
+    if _fallocate(fd, FALLOC_FL_KEEP_SIZE, offset, length) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
 async def get_expected_file_size(url: str, session: aiohttp.ClientSession) -> Optional[int]:
     """Get the expected file size from a HEAD request."""
     try:
-        async with session.head(url) as response:
+        async with session.head(url, timeout=HEAD_TIMEOUT) as response:
             if response.status == 200:
                 size = int(response.headers.get('Content-Length', 0))
                 if size > 0:
@@ -126,139 +239,176 @@ async def get_expected_file_size(url: str, session: aiohttp.ClientSession) -> Op
         logger.error(f"Error getting file size for {url}: {str(e)}")
     return None
 
-async def download_video(session, url, filename, retry_count: int = 0) -> bool:
-    """Download a video file with retry logic."""
-    output_path = os.path.join(DOWNLOAD_DIR, filename)
+async def _do_download(session, url, filename, attempt: int,
+                       expected_size: Optional[int]) -> bool:
+    """Make a single download attempt.
+
+    Returns False for failures that retrying will not fix, and raises
+    RetryableDownloadError, aiohttp.ClientError or asyncio.TimeoutError
+    for ones it might.
+    """
+    output_path = f"{DOWNLOAD_DIR}/{filename}"
     start_time = time.time()
     last_speed_check = start_time
     last_bytes_downloaded = 0
     
-    try:
-        logger.info(f"Attempting to download {filename} from {url} (attempt {retry_count + 1}/{MAX_RETRIES})")
-        
-        # Add delay between downloads to avoid rate limiting
-        if retry_count == 0:  # Only on first attempt
-            logger.info(f"Waiting {RATE_LIMIT_DELAY} seconds before starting download...")
-            await asyncio.sleep(RATE_LIMIT_DELAY)
-        
-        # Check network connectivity before attempting download
-        if not await check_network_connectivity():
-            logger.error("Network connectivity check failed, will retry")
-            if retry_count < MAX_RETRIES - 1:
-                await asyncio.sleep(RETRY_DELAY)
-                return await download_video(session, url, filename, retry_count + 1)
-            return False
-
-        # Get expected file size
+    logger.info(f"Attempting to download {filename} from {url} (attempt {attempt + 1}/{MAX_RETRIES})")
+    
+    # Get expected file size
+    if expected_size is None:
         expected_size = await get_expected_file_size(url, session)
-        if expected_size:
-            logger.info(f"Expected file size for {filename}: {expected_size} bytes")
-            
-            # Check if file exists and is incomplete
-            if os.path.exists(output_path):
-                actual_size = os.path.getsize(output_path)
-                if actual_size > 0 and actual_size < expected_size:
-                    logger.warning(f"Found incomplete file: {filename} (size: {actual_size}, expected: {expected_size})")
-                    # Remove from downloaded.txt if it exists
-                    if filename in get_downloaded_files():
-                        with open(DOWNLOADED_FILE, 'r') as f:
-                            lines = f.readlines()
-                        with open(DOWNLOADED_FILE, 'w') as f:
-                            for line in lines:
-                                if line.strip() != filename:
-                                    f.write(line)
-                    # Delete incomplete file
-                    os.remove(output_path)
+    resume_from = 0
+    if expected_size:
+        logger.info(f"Expected file size for {filename}: {expected_size} bytes")
+        
+        # Check if file exists and is incomplete
+        if os.path.exists(output_path):
+            actual_size = os.path.getsize(output_path)
+            if actual_size > 0 and actual_size < expected_size:
+                logger.warning(f"Found incomplete file: {filename} (size: {actual_size}, expected: {expected_size})")
+                # Remove from downloaded.txt if it exists
+                unmark_downloaded(filename)
+                # Resume from the end of the partial file
+                resume_from = actual_size
+    
+    headers = {'Range': f'bytes={resume_from}-'} if resume_from else None
+    # Timeouts, including the per-chunk sock_read limit, come from the session
+    async with session.get(url, headers=headers) as response:
+        # Log response headers for rate limit detection
+        logger.info(f"Response headers for {filename}: {dict(response.headers)}")
         
-        timeout = aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
-        async with session.get(url, timeout=timeout) as response:
-            # Log response headers for rate limit detection
-            logger.info(f"Response headers for {filename}: {dict(response.headers)}")
+        if response.status in (200, 206):
+            if response.status == 206:
+                logger.info(f"Resuming {filename} from byte {resume_from}")
+                mode = 'ab'
+            else:
+                # Server ignored the range (or none was sent), start over
+                resume_from = 0
+                mode = 'wb'
+            total_size = resume_from + int(response.headers.get('content-length', 0))
+            # The server's own length wins over a cached size from an earlier run
+            if 'content-length' in response.headers and expected_size and total_size != expected_size:
+                logger.warning(f"Size of {filename} changed on the server: expected {expected_size}, now {total_size}")
+                set_expected_size(filename, total_size)
+                expected_size = total_size
+            downloaded = 0
+            # Progress is logged at most once per PROGRESS_LOG_INTERVAL
+            log_progress = total_size > 0 and logger.isEnabledFor(logging.INFO)
+            last_logged_pct = -1
+            last_logged_ts = 0.0
             
-            if response.status == 200:
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded = 0
-                last_progress_time = time.time()
-                last_progress = 0
+            async with aiofiles.open(output_path, mode) as f:
+                # Reserve the rest of the file up front for a contiguous on-disk layout
+                if expected_size and expected_size > resume_from and _fallocate is not None:
+                    try:
+                        await asyncio.to_thread(
+                            preallocate, f.fileno(), resume_from, expected_size - resume_from
+                        )
+                    except OSError as e:
+                        logger.debug(f"Could not preallocate {filename}: {str(e)}")
                 
-                with open(output_path, 'wb') as f:
-                    while True:
-                        try:
-                            chunk = await asyncio.wait_for(
-                                response.content.read(CHUNK_SIZE),
-                                timeout=CHUNK_TIMEOUT
-                            )
-                            if not chunk:
-                                break
-                            f.write(chunk)
-                            downloaded += len(chunk)
+                try:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await f.write(chunk)
+                        downloaded += len(chunk)
+                        
+                        # Speed monitoring
+                        current_time = time.time()
+                        if current_time - last_speed_check >= SPEED_CHECK_INTERVAL:
+                            bytes_since_last_check = downloaded - last_bytes_downloaded
+                            speed = bytes_since_last_check / (current_time - last_speed_check)
+                            logger.info(f"Download speed for {filename}: {speed/1024:.2f} KB/s")
                             
-                            # Speed monitoring
-                            current_time = time.time()
-                            if current_time - last_speed_check >= SPEED_CHECK_INTERVAL:
-                                bytes_since_last_check = downloaded - last_bytes_downloaded
-                                speed = bytes_since_last_check / (current_time - last_speed_check)
-                                logger.info(f"Download speed for {filename}: {speed/1024:.2f} KB/s")
-                                
-                                if speed < MIN_SPEED_BYTES_PER_SECOND:
-                                    logger.warning(f"Download speed too slow for {filename}: {speed/1024:.2f} KB/s")
-                                    raise asyncio.TimeoutError("Download speed too slow")
-                                
-                                last_speed_check = current_time
-                                last_bytes_downloaded = downloaded
+                            if speed < MIN_SPEED_BYTES_PER_SECOND:
+                                logger.warning(f"Download speed too slow for {filename}: {speed/1024:.2f} KB/s")
+                                raise asyncio.TimeoutError("Download speed too slow")
                             
-                            if total_size > 0:
-                                progress = (downloaded / total_size) * 100
-                                current_time = time.time()
-                                
-                                # Only log if integer percent increased
-                                if int(progress) > int(last_progress):
-                                    last_progress = progress
-                                    last_progress_time = current_time
-                                    logger.info(f"Download progress for {filename}: {int(progress)}% (elapsed: {int(current_time - start_time)}s)")
-                        except asyncio.TimeoutError:
-                            logger.error(f"Chunk download timeout for {filename}")
-                            raise
-
-                # Verify download size if we had an expected size
-                if expected_size and downloaded != expected_size:
-                    logger.error(f"Download incomplete for {filename}: got {downloaded} bytes, expected {expected_size}")
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                    if retry_count < MAX_RETRIES - 1:
-                        await asyncio.sleep(RETRY_DELAY)
-                        return await download_video(session, url, filename, retry_count + 1)
-                    return False
-                
-                logger.info(f"Successfully downloaded {filename}")
-                mark_as_downloaded(filename)
-                return True
-            else:
-                error_msg = f"Failed to download {filename}: HTTP {response.status}"
-                if response.status == 404:
-                    error_msg += " - File not found"
-                elif response.status == 403:
-                    error_msg += " - Access forbidden"
-                elif response.status == 401:
-                    error_msg += " - Authentication required"
-                logger.error(error_msg)
-                return False
-    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-        logger.error(f"Network error downloading {filename}: {str(e)}")
-        logger.error(f"Full error details: {traceback.format_exc()}")
-        if retry_count < MAX_RETRIES - 1:
-            logger.info(f"Retrying download of {filename} in {RETRY_DELAY} seconds...")
-            await asyncio.sleep(RETRY_DELAY)
-            return await download_video(session, url, filename, retry_count + 1)
-        logger.error(f"Max retries reached for {filename}")
-        return False
-    except IOError as e:
-        logger.error(f"File system error downloading {filename}: {str(e)}")
-        return False
-    except Exception as e:
-        logger.error(f"Unexpected error downloading {filename}: {str(e)}")
-        logger.error(f"Full error details: {traceback.format_exc()}")
-        return False
+                            last_speed_check = current_time
+                            last_bytes_downloaded = downloaded
+                        
+                        if log_progress:
+                            pct = (resume_from + downloaded) * 100 // total_size
+                            now = time.monotonic()
+                            
+                            # Only log if integer percent changed and enough time passed
+                            if pct != last_logged_pct and now - last_logged_ts >= PROGRESS_LOG_INTERVAL:
+                                last_logged_pct = pct
+                                last_logged_ts = now
+                                logger.info(f"Download progress for {filename}: {pct}% (elapsed: {int(current_time - start_time)}s)")
+                except asyncio.TimeoutError:
+                    logger.error(f"Chunk download timeout for {filename}")
+                    raise
+
+            # Verify download size if we had an expected size
+            file_size = resume_from + downloaded
+            if expected_size and file_size != expected_size:
+                logger.error(f"Download incomplete for {filename}: got {file_size} bytes, expected {expected_size}")
+                # A short file is resumed on retry; anything else starts over
+                if file_size > expected_size and os.path.exists(output_path):
+                    os.remove(output_path)
+                raise StaleSizeError(f"got {file_size} of {expected_size} bytes")
+            
+            logger.info(f"Successfully downloaded {filename}")
+            await mark_as_downloaded(filename)
+            return True
+        elif response.status == 416:
+            # Resumed past the end, so the file shrank since its size was cached
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise StaleSizeError(f"range {resume_from}- not satisfiable (HTTP 416)")
+        elif response.status in (429, 503):
+            # Server asked us to slow down, back off before retrying
+            raise RetryableDownloadError(f"rate limited (HTTP {response.status})")
+        else:
+            error_msg = f"Failed to download {filename}: HTTP {response.status}"
+            if response.status == 404:
+                error_msg += " - File not found"
+            elif response.status == 403:
+                error_msg += " - Access forbidden"
+            elif response.status == 401:
+                error_msg += " - Authentication required"
+            logger.error(error_msg)
+            return False
+
+async def download_video(session, url, filename,
+                         expected_size: Optional[int] = None,
+                         semaphore: Optional[asyncio.Semaphore] = None) -> bool:
+    """Download a video file with retry logic.
+
+    expected_size, when known from file_sizes.json or an earlier HEAD
+    request, skips the HEAD request for this file. A size that turns out
+    to be stale is dropped and fetched again on the next attempt.
+    semaphore, if given, is held for each attempt but not while backing
+    off, so a failing file does not block other downloads.
+    """
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with semaphore or nullcontext():
+                return await _do_download(session, url, filename, attempt, expected_size)
+        except StaleSizeError as e:
+            logger.error(f"Download of {filename} failed: {str(e)}")
+            expected_size = None
+            set_expected_size(filename, None)
+        except RetryableDownloadError as e:
+            logger.error(f"Download of {filename} failed: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Network error downloading {filename}: {str(e)}")
+            logger.error(f"Full error details: {traceback.format_exc()}")
+        except IOError as e:
+            logger.error(f"File system error downloading {filename}: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error downloading {filename}: {str(e)}")
+            logger.error(f"Full error details: {traceback.format_exc()}")
+            return False
+        
+        if attempt < MAX_RETRIES - 1:
+            delay = retry_backoff(attempt)
+            logger.info(f"Retrying download of {filename} in {delay:.0f} seconds...")
+            await asyncio.sleep(delay)
+    
+    logger.error(f"Max retries reached for {filename}")
+    return False
 
 async def download_videos(limit: Optional[int] = None) -> None:
     """Download videos from the list that haven't been downloaded yet."""
@@ -273,9 +423,11 @@ async def download_videos(limit: Optional[int] = None) -> None:
     with open(DOWNLOAD_LIST_FILE, 'r') as f:
         video_urls = [line.strip() for line in f if line.strip()]
     
-    # Filter for URLs only and exclude already downloaded files
-    video_urls = [url for url in video_urls if is_url(url)]
-    video_urls = [url for url in video_urls if get_filename(url) not in downloaded_files]
+    # Filter for URLs only and exclude already downloaded files in one pass
+    video_urls = [
+        url for url in video_urls
+        if url.startswith(URL_PREFIXES) and url.rsplit('/', 1)[-1] not in downloaded_files
+    ]
     
     if not video_urls:
         logger.info("No new videos to download")
@@ -288,41 +440,91 @@ async def download_videos(limit: Optional[int] = None) -> None:
     else:
         logger.info(f"Downloading {len(video_urls)} videos")
     
-    # First, get all file sizes with rate limiting
+    # First, get all file sizes concurrently, reusing sizes from earlier runs
+    cached_sizes = get_expected_sizes()
     file_sizes = {}
-    timeout = aiohttp.ClientTimeout(total=30)  # 30 second timeout for HEAD requests
-    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS)
-    
-    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-        for url in video_urls:
-            filename = get_filename(url)
-            size = await get_expected_file_size(url, session)
-            if size:
-                file_sizes[filename] = size
-                logger.info(f"Got size for {filename}: {size} bytes")
-            await asyncio.sleep(RATE_LIMIT_DELAY)  # Rate limit the HEAD requests
+    to_fetch = []
+    for url in video_urls:
+        filename = get_filename(url)
+        if filename in cached_sizes:
+            file_sizes[filename] = cached_sizes[filename]
+        else:
+            to_fetch.append(url)
+    logger.info(f"Using {len(file_sizes)} cached file sizes, fetching {len(to_fetch)}")
     
-    # Now download files with higher concurrency
-    timeout = aiohttp.ClientTimeout(total=None)  # No timeout for the session
-    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_DOWNLOADS)
-    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-        tasks = []
-        for url in video_urls:
-            filename = get_filename(url)
-            task = asyncio.create_task(download_video(session, url, filename))
-            tasks.append(task)
-        
-        # Wait for all downloads to complete
-        await asyncio.gather(*tasks)
+    # One session serves both the HEAD and download phases so pooled
+    # keep-alive connections (and their TLS sessions) are reused.
+    # sock_read raises asyncio.TimeoutError if no data arrives for CHUNK_TIMEOUT
+    timeout = aiohttp.ClientTimeout(
+        total=DOWNLOAD_TIMEOUT,
+        connect=30,
+        sock_connect=30,
+        sock_read=CHUNK_TIMEOUT
+    )
+    connector = make_connector(
+        limit=0,
+        limit_per_host=MAX_CONCURRENT_REQUESTS,
+        keepalive_timeout=300,
+        force_close=False
+    )
+    global _DOWNLOADED_LOG
+    _DOWNLOADED_LOG = await aiofiles.open(DOWNLOADED_FILE, 'a')
+    try:
+        async with aiohttp.ClientSession(
+            timeout=timeout,
+            connector=connector,
+            read_bufsize=READ_BUFSIZE
+        ) as session:
+            head_sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+            
+            async def fetch_size(url: str):
+                async with head_sem:
+                    return get_filename(url), await get_expected_file_size(url, session)
+            
+            fetched = {}
+            for filename, size in await asyncio.gather(*(fetch_size(url) for url in to_fetch)):
+                if size:
+                    fetched[filename] = size
+                    logger.info(f"Got size for {filename}: {size} bytes")
+            
+            if fetched:
+                file_sizes.update(fetched)
+                save_expected_sizes({**cached_sizes, **fetched})
+            
+            # Now download files; the connector no longer caps downloads,
+            # so bound the attempts explicitly
+            download_sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+            
+            tasks = []
+            for url in video_urls:
+                filename = get_filename(url)
+                task = asyncio.create_task(download_video(
+                    session, url, filename,
+                    expected_size=file_sizes.get(filename),
+                    semaphore=download_sem
+                ))
+                tasks.append(task)
+            
+            # Wait for all downloads to complete
+            await asyncio.gather(*tasks)
+    finally:
+        await _DOWNLOADED_LOG.close()
+        _DOWNLOADED_LOG = None
+        save_downloaded_files()
 
 async def main():
     """Main entry point."""
     args = parse_args()
+    if args.preflight_check and not await check_network_connectivity():
+        logger.error("Network connectivity check failed, aborting")
+        return
     await download_videos(args.limit)
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Download videos.')
     parser.add_argument('--limit', type=int, help='Limit the number of videos to process')
+    parser.add_argument('--preflight-check', action='store_true',
+                        help='Check DNS and network connectivity once before downloading')
     return parser.parse_args()
 
 if __name__ == '__main__':
@@ -1,8 +1,219 @@
+import os
+import logging
+import threading
+import torch
 import whisper
 import argparse
 from pathlib import Path
 import concurrent.futures
-from typing import List, Optional, Dict
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import torchaudio
+except ImportError:
+    torchaudio = None
+
+try:
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+except ImportError:
+    BatchedInferencePipeline = WhisperModel = None
+    VadOptions = get_speech_timestamps = None
+
+logger = logging.getLogger(__name__)
+
+# "faster-whisper" (CTranslate2, quantized) or "openai-whisper" (reference PyTorch)
+WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'faster-whisper')
+# CTranslate2 compute type for faster-whisper: int8, int8_float16, float16, ...
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE') or (
+    'float16' if torch.cuda.is_available() else 'int8'
+)
+# CPU threads used by CTranslate2 for one model
+WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', '0')) or os.cpu_count() or 1
+# Concurrent transcribe calls one faster-whisper model can serve
+WHISPER_NUM_WORKERS = 1
+# Silence longer than this is cut before unbatched decoding (faster-whisper's
+# own default is 2000 ms); the batched pipeline keeps its 160 ms default
+VAD_MIN_SILENCE_MS = 500
+# Language passed to whisper; "en" also selects the smaller English-only
+# models, and an empty value or "auto" turns language detection back on
+WHISPER_LANGUAGE = os.getenv('WHISPER_LANGUAGE', 'en')
+# Sizes that ship an English-only ".en" variant
+ENGLISH_ONLY_MODELS = {'tiny', 'base', 'small', 'medium'}
+# Dynamic int8 quantization of the reference model's Linear layers on CPU
+WHISPER_INT8 = os.getenv('WHISPER_INT8', '1') != '0'
+# torch.compile the reference model's encoder on GPU
+WHISPER_COMPILE = os.getenv('WHISPER_COMPILE', '1') != '0'
+# CPU threads each process-pool worker gets when --workers is not given
+THREADS_PER_MODEL = int(os.getenv('WHISPER_THREADS_PER_MODEL', '4'))
+# Audio chunks encoded together by faster-whisper; 1 disables batching
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '16'))
+
+# openai-whisper installs KV-cache hooks on the shared decoder for every
+# decode, so concurrent transcribe calls on one model corrupt each other
+_whisper_lock = threading.Lock()
+
+# Audio is staged to the GPU in slices of this many samples (~4 min at 16 kHz)
+# through two fixed pinned buffers, so page-locked memory stays at 32 MiB
+PINNED_SLICE_SAMPLES = 4 * 1024 * 1024
+# Pinned staging buffers and the events marking when copies out of them finished
+_pinned_buffers = None
+_pinned_copied = [None, None]
+_pinned_lock = threading.Lock()
+
+def set_num_workers(num_workers: int) -> None:
+    """
+    Size the cached models for that many concurrent callers.
+    
+    Must be called before the first model load. Unless WHISPER_CPU_THREADS
+    is set, the CPU is split between the workers.
+    """
+    global WHISPER_NUM_WORKERS, WHISPER_CPU_THREADS
+    WHISPER_NUM_WORKERS = num_workers
+    if not os.getenv('WHISPER_CPU_THREADS'):
+        WHISPER_CPU_THREADS = max(1, (os.cpu_count() or 1) // num_workers)
+
+def use_faster_whisper() -> bool:
+    """Check whether the faster-whisper backend is selected and installed."""
+    return WHISPER_BACKEND == 'faster-whisper' and WhisperModel is not None
+
+def _normalize_language(language: Optional[str]) -> Optional[str]:
+    """Map an empty or "auto" language to None so whisper detects it."""
+    return None if not language or language == 'auto' else language
+
+def resolve_model_name(model_name: str, language: Optional[str] = WHISPER_LANGUAGE) -> str:
+    """Use the English-only variant of a model when transcribing English."""
+    if _normalize_language(language) == 'en' and model_name in ENGLISH_ONLY_MODELS:
+        return f"{model_name}.en"
+    return model_name
+
+@lru_cache(maxsize=2)
+def _get_whisper_model(model_name: str):
+    """Load a reference openai-whisper model once and reuse it across files."""
+    logger.info(f"Loading {model_name} model...")
+    model = whisper.load_model(model_name)
+    if WHISPER_INT8 and not torch.cuda.is_available():
+        model = _quantize_linear(model)
+    elif WHISPER_COMPILE and torch.cuda.is_available() and hasattr(torch, 'compile'):
+        # The encoder always sees a fixed 30s mel window, so it compiles to a
+        # single graph; the decoder's KV-cache hooks and growing inputs do not
+        eager_encoder = model.encoder
+        try:
+            model.encoder = torch.compile(eager_encoder, mode="reduce-overhead")
+            # Compilation is lazy, so run one fp16 window (what transcribe
+            # feeds on GPU) now; missing compilers etc. fail here, not per file
+            with torch.no_grad():
+                model.encoder(torch.zeros(
+                    1, model.dims.n_mels, whisper.audio.N_FRAMES,
+                    dtype=torch.float16, device=model.device
+                ))
+        except Exception as e:
+            model.encoder = eager_encoder
+            logger.warning(f"torch.compile unavailable, using eager encoder: {e}")
+    return model
+
+def _quantize_linear(model):
+    """Quantize a whisper model's Linear layers to dynamic int8 for CPU inference."""
+    # whisper uses its own nn.Linear subclass, which quantize_dynamic skips;
+    # its forward only adds a dtype cast, so plain nn.Linear is equivalent
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+@lru_cache(maxsize=2)
+def _get_model(model_name: str):
+    """Load a model for the selected backend once and reuse it across files."""
+    if use_faster_whisper():
+        logger.info(f"Loading {model_name} model ({WHISPER_COMPUTE_TYPE})...")
+        return WhisperModel(
+            model_name,
+            device="auto",
+            compute_type=WHISPER_COMPUTE_TYPE,
+            cpu_threads=WHISPER_CPU_THREADS,
+            num_workers=WHISPER_NUM_WORKERS
+        )
+    return _get_whisper_model(model_name)
+
+@lru_cache(maxsize=2)
+def _get_pipeline(model_name: str):
+    """Wrap the cached faster-whisper model in a batched inference pipeline."""
+    return BatchedInferencePipeline(model=_get_model(model_name))
+
+def _to_cuda(wav):
+    """
+    Copy a 1-D float32 CPU tensor to the GPU through fixed pinned buffers.
+    
+    Slices alternate between two buffers, so filling one overlaps the async
+    copy out of the other; a buffer is only overwritten once its last copy
+    has finished.
+    """
+    global _pinned_buffers
+    result = torch.empty(wav.numel(), dtype=wav.dtype, device="cuda")
+    with _pinned_lock:
+        if _pinned_buffers is None:
+            _pinned_buffers = [
+                torch.empty(PINNED_SLICE_SAMPLES, dtype=torch.float32, pin_memory=True)
+                for _ in range(2)
+            ]
+        for i, start in enumerate(range(0, wav.numel(), PINNED_SLICE_SAMPLES)):
+            k = i % 2
+            if _pinned_copied[k] is not None:
+                _pinned_copied[k].synchronize()
+            chunk = wav[start:start + PINNED_SLICE_SAMPLES]
+            staged = _pinned_buffers[k][:chunk.numel()]
+            staged.copy_(chunk)
+            result[start:start + chunk.numel()].copy_(staged, non_blocking=True)
+            _pinned_copied[k] = torch.cuda.Event()
+            _pinned_copied[k].record()
+    return result
+
+def _load_audio(audio_path: str):
+    """
+    Decode audio in-process to a 16 kHz mono float CPU tensor for openai-whisper.
+    
+    Falls back to the path itself (decoded by whisper's ffmpeg subprocess)
+    when torchaudio is missing or cannot read the file.
+    """
+    if torchaudio is None:
+        return audio_path
+    try:
+        wav, sample_rate = torchaudio.load(audio_path)
+    except Exception as e:
+        logger.debug(f"torchaudio could not load {audio_path} ({e}), using ffmpeg")
+        return audio_path
+    # Downmix and resample on the CPU so only the 16 kHz mono signal is copied
+    wav = wav.mean(0)
+    if sample_rate != whisper.audio.SAMPLE_RATE:
+        wav = torchaudio.functional.resample(wav, sample_rate, whisper.audio.SAMPLE_RATE)
+    return wav.float()
+
+def _to_device(audio):
+    """Move a loaded CPU waveform to the GPU, if there is one; paths pass through."""
+    if isinstance(audio, str) or not torch.cuda.is_available():
+        return audio
+    return _to_cuda(audio)
+
+def _speech_only(audio):
+    """
+    Cut silent stretches out of 16 kHz CPU audio with faster-whisper's Silero VAD.
+    
+    Used on the openai-whisper path, whose transcribe has no VAD of its own;
+    timestamps of the result no longer line up with the source, so only use
+    it where just the text matters. Audio is returned as-is if the VAD is
+    unavailable or finds no speech.
+    """
+    if get_speech_timestamps is None:
+        return audio
+    if isinstance(audio, str):
+        audio = torch.from_numpy(whisper.load_audio(audio))
+    speech = get_speech_timestamps(
+        audio.numpy(), VadOptions(min_silence_duration_ms=VAD_MIN_SILENCE_MS)
+    )
+    if not speech:
+        return audio
+    return torch.cat([audio[chunk['start']:chunk['end']] for chunk in speech])
 
 def transcribe_audio_with_timestamps(audio_path: str, model_name: str = "base", language: Optional[str] = None) -> Dict:
     """
@@ -24,60 +235,197 @@ def transcribe_audio_with_timestamps(audio_path: str, model_name: str = "base",
     if not audio_path.exists():
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
-    # Load the model
-    print(f"Loading {model_name} model...")
-    model = whisper.load_model(model_name)
+    # Load the model (cached after the first call)
+    model = _get_whisper_model(model_name)
     
-    # Transcribe the audio with verbose output and language detection
-    print(f"Transcribing {audio_path}...")
-    result = model.transcribe(
-        str(audio_path),
-        language=language,
-        verbose=True  # Shows progress
-    )
+    # Transcribe the audio with language detection; segments come back in
+    # the result, so skip whisper's per-segment printing in the decode loop
+    logger.debug(f"Transcribing {audio_path}...")
+    audio = _to_device(_load_audio(str(audio_path)))
+    with _whisper_lock:
+        result = model.transcribe(
+            audio,
+            language=language,
+            fp16=torch.cuda.is_available(),  # Half precision only on GPU
+            verbose=None  # No per-segment prints and no progress bar
+        )
+    logger.debug(f"Transcribed {len(result['segments'])} segments ({result['language']})")
     
     return result
 
-def transcribe_audio(audio_path: str, model_name: str = "base") -> str:
+def transcribe_audio_iter(audio_path: str, model_name: str = "base",
+                          language: Optional[str] = WHISPER_LANGUAGE) -> Iterator[str]:
     """
-    Transcribe an audio file using OpenAI's Whisper model.
+    Transcribe an audio file, yielding the text segment by segment.
     
     Args:
         audio_path (str): Path to the audio file
         model_name (str): Name of the Whisper model to use (tiny, base, small, medium, large)
+        language (str, optional): Language code; None or "auto" runs language detection
         
     Returns:
-        str: Transcribed text
+        Iterator[str]: Text of each transcribed segment, in order
     """
     # Validate audio file exists
     audio_path = Path(audio_path)
     if not audio_path.exists():
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
-    # Load the model
-    print(f"Loading {model_name} model...")
-    model = whisper.load_model(model_name)
+    # A known language skips the detection pass over the first 30s
+    language = _normalize_language(language)
+    model_name = resolve_model_name(model_name, language)
+    
+    # Load the model (cached after the first call)
+    model = _get_model(model_name)
+    
+    if use_faster_whisper():
+        # Transcribe the audio; segments are decoded lazily as they are consumed
+        logger.debug(f"Transcribing {audio_path}...")
+        if WHISPER_BATCH_SIZE > 1:
+            # VAD-split chunks of the file go through the encoder in batches
+            segments, _ = _get_pipeline(model_name).transcribe(
+                str(audio_path),
+                language=language,
+                beam_size=1,
+                batch_size=WHISPER_BATCH_SIZE
+            )
+        else:
+            segments, _ = model.transcribe(
+                str(audio_path),
+                language=language,
+                beam_size=1,
+                vad_filter=True,
+                vad_parameters=dict(min_silence_duration_ms=VAD_MIN_SILENCE_MS)
+            )
+        return (segment.text for segment in segments)
     
     # Transcribe the audio
-    print(f"Transcribing {audio_path}...")
-    result = model.transcribe(str(audio_path))
+    logger.debug(f"Transcribing {audio_path}...")
+    # VAD runs on the CPU waveform; only the speech is copied to the GPU
+    audio = _to_device(_speech_only(_load_audio(str(audio_path))))
+    with _whisper_lock:
+        result = model.transcribe(
+            audio,
+            language=language,
+            fp16=torch.cuda.is_available()
+        )
+    
+    return (segment["text"] for segment in result["segments"])
+
+def transcribe_audio(audio_path: str, model_name: str = "base",
+                     language: Optional[str] = WHISPER_LANGUAGE) -> str:
+    """
+    Transcribe an audio file using OpenAI's Whisper model.
     
-    return result["text"]
+    Args:
+        audio_path (str): Path to the audio file
+        model_name (str): Name of the Whisper model to use (tiny, base, small, medium, large)
+        language (str, optional): Language code; None or "auto" runs language detection
+        
+    Returns:
+        str: Transcribed text
+    """
+    return "".join(transcribe_audio_iter(audio_path, model_name, language))
 
-def process_file(file_path: Path, model_name: str) -> None:
-    """Process a single audio/video file and save its transcription."""
+# Finishes transcript writes while the next file is transcribed
+_writer_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+def write_transcript(output_path, transcription: str) -> None:
+    """Write a transcript as UTF-8 bytes straight to the file descriptor."""
+    data = memoryview(transcription.encode("utf-8"))
+    fd = os.open(str(output_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # os.write may write less than asked, so loop until everything is out
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+def _finish_transcript(f, tmp_path: Path, output_path: Path) -> None:
+    """Flush and close a streamed transcript, then move it into place."""
+    try:
+        f.close()
+        os.replace(tmp_path, output_path)
+        logger.debug(f"Transcription saved to: {output_path}")
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        logger.error(f"Error saving {output_path}: {e}")
+
+def process_file(file_path: Path, model_name: str,
+                 language: Optional[str] = WHISPER_LANGUAGE) -> Optional[concurrent.futures.Future]:
+    """
+    Process a single audio/video file and save its transcription.
+    
+    The final flush and rename run on a background writer thread so the next
+    file can start transcribing; the returned future (None on failure)
+    completes once the transcript is in place.
+    """
+    output_path = file_path.with_suffix('.txt')
+    tmp_path = output_path.with_suffix('.txt.tmp')
+    f = None
     try:
-        transcription = transcribe_audio(str(file_path), model_name)
-        output_path = file_path.with_suffix('.txt')
-        output_path.write_text(transcription, encoding="utf-8")
-        print(f"Transcription saved to: {output_path}")
+        segments = transcribe_audio_iter(str(file_path), model_name, language)
+        # Stream segments to disk as they are decoded; the temp file keeps a
+        # failed run from leaving a partial transcript that looks complete
+        f = tmp_path.open("w", encoding="utf-8", buffering=1 << 20)
+        for text in segments:
+            f.write(text)
+        return _writer_pool.submit(_finish_transcript, f, tmp_path, output_path)
     except Exception as e:
-        print(f"Error processing {file_path}: {e}")
+        if f is not None:
+            f.close()
+        tmp_path.unlink(missing_ok=True)
+        logger.error(f"Error processing {file_path}: {e}")
+        return None
+
+def _init_worker(model_name: str, threads: int) -> None:
+    """Give a pool worker its share of the CPU and load its own model."""
+    global WHISPER_CPU_THREADS
+    # Keep each worker's OpenMP/CTranslate2 pool within its share
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    torch.set_num_threads(threads)
+    WHISPER_CPU_THREADS = threads
+    _get_model(model_name)
+
+def _worker_transcribe(file_path: Path, model_name: str, language: Optional[str]) -> None:
+    """Transcribe one file in a pool worker using its cached model."""
+    # Pool workers exit without running atexit hooks, so finish the write here
+    future = process_file(file_path, model_name, language)
+    if future is not None:
+        future.result()
 
 def get_media_files(directory: Path) -> List[Path]:
-    """Get all media files from the directory."""
+    """
+    Get the media files in the directory that still need transcribing.
+    
+    A single scandir pass collects both media files and transcripts; files
+    with a non-empty transcript newer than the media itself are skipped.
+    The rest are returned smallest first, so quick results land early.
+    """
     media_extensions = {'.mp4', '.mp3', '.wav', '.m4a', '.avi', '.mov'}
-    return [f for f in directory.iterdir() if f.is_file() and f.suffix.lower() in media_extensions]
+    media = []  # (size, mtime_ns, path)
+    transcripts = {}  # stem -> (size, mtime_ns)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext in media_extensions:
+                st = entry.stat()
+                media.append((st.st_size, st.st_mtime_ns, entry.path))
+            elif ext == '.txt':
+                st = entry.stat()
+                transcripts[stem] = (st.st_size, st.st_mtime_ns)
+    
+    pending = []
+    for size, mtime_ns, path in media:
+        transcript = transcripts.get(os.path.splitext(os.path.basename(path))[0])
+        if transcript and transcript[0] > 0 and transcript[1] >= mtime_ns:
+            continue
+        pending.append((size, path))
+    pending.sort()
+    return [Path(path) for _, path in pending]
 
 def main():
     parser = argparse.ArgumentParser(description="Transcribe audio/video files using OpenAI's Whisper")
@@ -85,35 +433,78 @@ def main():
     parser.add_argument("--directory", help="Path to directory containing audio/video files")
     parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"],
                       help="Whisper model to use (default: base)")
+    parser.add_argument("--language", default=WHISPER_LANGUAGE,
+                      help="Language code of the audio; 'en' uses the faster English-only "
+                           "tiny/base/small/medium models, 'auto' detects it per file "
+                           f"(default: {WHISPER_LANGUAGE or 'auto'})")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                      help="Log per-file progress")
+    parser.add_argument("--workers", type=int, default=0,
+                      help="Processes for --directory, each with its own model "
+                           "(default: 1 on GPU, else one per WHISPER_THREADS_PER_MODEL cores)")
     
     args = parser.parse_args()
     
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
     if not args.file and not args.directory:
         parser.error("Either file path or --directory must be specified")
     
+    # Resolve once so pool workers preload the model actually used
+    args.model = resolve_model_name(args.model, args.language)
+    
     try:
         if args.file:
             # Process single file
             file_path = Path(args.file)
-            process_file(file_path, args.model)
+            process_file(file_path, args.model, args.language)
         else:
             # Process directory
             directory = Path(args.directory)
             if not directory.exists() or not directory.is_dir():
                 raise NotADirectoryError(f"Directory not found: {directory}")
             
+            # Already-transcribed files are left out, so a finished
+            # directory never loads a model
             media_files = get_media_files(directory)
             if not media_files:
-                print(f"No media files found in {directory}")
+                logger.info(f"No untranscribed media files found in {directory}")
                 return 0
             
-            print(f"Found {len(media_files)} media files to process")
-            for file_path in media_files:
-                process_file(file_path, args.model)
+            logger.info(f"Found {len(media_files)} media files to process")
+            cpu_count = os.cpu_count() or 1
+            workers = args.workers or (
+                1 if torch.cuda.is_available() else cpu_count // THREADS_PER_MODEL
+            )
+            workers = max(1, min(workers, len(media_files)))
+            if workers == 1:
+                for file_path in media_files:
+                    process_file(file_path, args.model, args.language)
+            else:
+                # Inference holds the GIL, so use processes rather than threads
+                logger.info(f"Using {workers} worker processes")
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(args.model, max(1, cpu_count // workers))
+                ) as executor:
+                    list(executor.map(
+                        _worker_transcribe,
+                        media_files,
+                        [args.model] * len(media_files),
+                        [args.language] * len(media_files),
+                        chunksize=1
+                    ))
             
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error(f"Error: {e}")
         return 1
+    finally:
+        # Wait for transcripts still being written in the background
+        _writer_pool.shutdown(wait=True)
     
     return 0
 
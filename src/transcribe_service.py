@@ -1,13 +1,29 @@
 import os
+import json
+import hashlib
+import shutil
 import logging
 from pathlib import Path
 import sys
-import time
-from typing import Optional
+import queue
+import threading
+from typing import Dict, Optional, Set
+
+import torch
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
 
 # Add parent directory to path to import transcribe
 sys.path.append(str(Path(__file__).parent.parent))
-from transcribe import transcribe_audio
+from transcribe import (
+    WHISPER_CPU_THREADS, WHISPER_LANGUAGE, _get_model, resolve_model_name,
+    set_num_workers, transcribe_audio, write_transcript
+)
 
 # Set up logging
 logging.basicConfig(
@@ -17,30 +33,144 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Constants - will be overridden by environment variables if set
-DOWNLOAD_DIR = os.getenv('DOWNLOAD_DIR', '/data/videos')
-TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', '/data/transcripts')
+# Trailing slashes stripped so per-file paths can be built with f-strings
+DOWNLOAD_DIR = os.getenv('DOWNLOAD_DIR', '/data/videos').rstrip('/')
+TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', '/data/transcripts').rstrip('/')
 TRACKING_DIR = os.getenv('TRACKING_DIR', '/data/tracking')
 MODEL_SIZE = os.getenv('WHISPER_MODEL', 'base')
 DOWNLOADED_FILE = os.path.join(TRACKING_DIR, 'downloaded.txt')
+# Transcripts keyed by media SHA-256, model and language, so re-hosted copies
+# are not re-transcribed but a model or language change is not served stale
+CONTENT_CACHE_DIR = os.path.join(TRACKING_DIR, 'transcript_cache')
+CONTENT_CACHE_TAG = f"{resolve_model_name(MODEL_SIZE)}-{WHISPER_LANGUAGE or 'auto'}"
+# Append-only JSON lines, one per hashed file; later lines win
+CONTENT_HASHES_FILE = os.path.join(TRACKING_DIR, 'content_hashes.jsonl')
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB blocks
+# Parallel transcriptions; a single GPU runs one at a time to avoid OOM, and
+# on CPU each worker gets WHISPER_CPU_THREADS cores (all of them by default)
+TRANSCRIBE_WORKERS = int(os.getenv('TRANSCRIBE_WORKERS', '0')) or (
+    1 if torch.cuda.is_available() else max(1, (os.cpu_count() or 1) // WHISPER_CPU_THREADS)
+)
+# Fallback rescan interval in case a filesystem event is missed
+RESCAN_INTERVAL = 60
+
+# filename -> {"size", "mtime_ns", "sha256"}, loaded on first use
+_content_hashes: Optional[Dict[str, Dict]] = None
+_content_hashes_lock = threading.Lock()
+
+# Read position in downloaded.txt, and the inode it belongs to
+_downloaded_offset = 0
+_downloaded_inode: Optional[int] = None
+
+def _hash_file(path: str) -> str:
+    """Compute the SHA-256 of a file, streaming it in blocks."""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+def _load_content_hashes() -> Dict[str, Dict]:
+    """Replay the content hashes log into a filename -> entry dict."""
+    hashes = {}
+    try:
+        with open(CONTENT_HASHES_FILE, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line from an interrupted append
+                hashes[entry.pop('name')] = entry
+    except FileNotFoundError:
+        pass
+    return hashes
+
+def get_content_digest(filename: str, video_path: str) -> str:
+    """Get the SHA-256 of a video, reusing the stored hash if the file is unchanged."""
+    global _content_hashes
+    st = os.stat(video_path)
+    with _content_hashes_lock:
+        if _content_hashes is None:
+            _content_hashes = _load_content_hashes()
+        entry = _content_hashes.get(filename)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+    
+    digest = _hash_file(video_path)
+    entry = {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': digest,
+    }
+    with _content_hashes_lock:
+        _content_hashes[filename] = entry
+        # Append one line instead of rewriting every known hash
+        with open(CONTENT_HASHES_FILE, 'a') as f:
+            f.write(json.dumps({'name': filename, **entry}) + '\n')
+    return digest
 
 def get_downloaded_files():
-    """Get list of already downloaded files."""
-    if not os.path.exists(DOWNLOADED_FILE):
+    """
+    Get files added to downloaded.txt since the last call, without duplicates.
+    
+    The list is re-read from the start if the downloader replaced or
+    truncated it (e.g. after dropping an incomplete file).
+    """
+    global _downloaded_offset, _downloaded_inode
+    try:
+        f = open(DOWNLOADED_FILE, 'rb')
+    except FileNotFoundError:
         return []
-    with open(DOWNLOADED_FILE, 'r') as f:
-        return [line.strip() for line in f if line.strip()]
+    with f:
+        st = os.fstat(f.fileno())
+        if st.st_ino != _downloaded_inode or st.st_size < _downloaded_offset:
+            _downloaded_inode = st.st_ino
+            _downloaded_offset = 0
+        f.seek(_downloaded_offset)
+        data = f.read()
+    # Leave a partially written last line for the next call
+    end = data.rfind(b'\n') + 1
+    _downloaded_offset += end
+    lines = data[:end].decode('utf-8', 'replace').splitlines()
+    # dict.fromkeys drops repeated entries while keeping file order
+    return list(dict.fromkeys(line.strip() for line in lines if line.strip()))
 
-def process_video(filename):
+def get_existing_transcripts() -> Set[str]:
+    """Get the base names of non-empty transcripts already in TRANSCRIPT_DIR."""
+    with os.scandir(TRANSCRIPT_DIR) as entries:
+        return {
+            e.name[:-4] for e in entries
+            if e.name.endswith('.txt') and e.stat().st_size > 0
+        }
+
+def process_video(filename, existing_transcripts: Optional[Set[str]] = None):
     """Process a video file using the existing transcribe module."""
-    video_path = os.path.join(DOWNLOAD_DIR, filename)
-    transcript_path = os.path.join(TRANSCRIPT_DIR, f"{os.path.splitext(filename)[0]}.txt")
+    stem = os.path.splitext(filename)[0]
+    video_path = f"{DOWNLOAD_DIR}/{filename}"
+    transcript_path = f"{TRANSCRIPT_DIR}/{stem}.txt"
     
     # Skip if transcript already exists
-    if os.path.exists(transcript_path):
+    if existing_transcripts is not None:
+        transcript_exists = stem in existing_transcripts
+    else:
+        transcript_exists = os.path.exists(transcript_path)
+    if transcript_exists:
         logger.info(f"Transcript for {filename} already exists, skipping transcription")
         return True
         
     try:
+        # Reuse the transcript of identical media seen under another name
+        digest = get_content_digest(filename, video_path)
+        cached_path = f"{CONTENT_CACHE_DIR}/{digest}-{CONTENT_CACHE_TAG}.txt"
+        if os.path.exists(cached_path):
+            shutil.copyfile(cached_path, transcript_path)
+            if existing_transcripts is not None:
+                existing_transcripts.add(stem)
+            logger.info(f"Reused cached transcript for {filename} (sha256 {digest[:12]})")
+            return True
+        
         logger.info(f"Starting transcription of {filename}")
         logger.info(f"Using model size: {MODEL_SIZE}")
         
@@ -48,8 +178,10 @@ def process_video(filename):
         transcription = transcribe_audio(video_path, MODEL_SIZE)
         
         # Save the transcript
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            f.write(transcription)
+        write_transcript(transcript_path, transcription)
+        shutil.copyfile(transcript_path, cached_path)
+        if existing_transcripts is not None:
+            existing_transcripts.add(stem)
             
         logger.info(f"Successfully transcribed {filename}")
         return True
@@ -57,37 +189,127 @@ def process_video(filename):
         logger.error(f"Error transcribing {filename}: {str(e)}")
         return False
 
+class DownloadedListHandler(FileSystemEventHandler):
+    """Wake the scan loop whenever downloaded.txt is written or replaced."""
+
+    def __init__(self, changed: threading.Event):
+        super().__init__()
+        self.changed = changed
+
+    def _check(self, *paths):
+        name = os.path.basename(DOWNLOADED_FILE)
+        if any(path and os.path.basename(path) == name for path in paths):
+            self.changed.set()
+
+    # Only write-type events; opened events fire on our own reads of the list
+    def on_created(self, event):
+        self._check(event.src_path)
+
+    def on_modified(self, event):
+        self._check(event.src_path)
+
+    def on_closed(self, event):
+        self._check(event.src_path)
+
+    def on_moved(self, event):
+        # Atomic saves show up as a move of the temp file onto downloaded.txt
+        self._check(event.dest_path)
+
+def transcription_worker(work_queue: "queue.Queue[str]", queued: Set[str],
+                         existing_transcripts: Set[str]) -> None:
+    """Transcribe filenames from the queue as they arrive."""
+    while True:
+        filename = work_queue.get()
+        try:
+            process_video(filename, existing_transcripts)
+        finally:
+            # Failed files become eligible to be queued again on the next scan
+            queued.discard(filename)
+            work_queue.task_done()
+
 def main():
     """Main function to run the transcription service."""
     # Create directories if they don't exist
     os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+    os.makedirs(CONTENT_CACHE_DIR, exist_ok=True)
+    
+    # Workers transcribe continuously while the loop below keeps scanning,
+    # so files downloaded mid-batch are picked up without waiting for it
+    work_queue: "queue.Queue[str]" = queue.Queue()
+    queued: Set[str] = set()
+    existing_transcripts = get_existing_transcripts()
     
+    # Load the model once up front; workers share the cached instance, which
+    # faster-whisper serves with one replica per worker (openai-whisper
+    # transcriptions are serialized by a lock in transcribe.py)
+    set_num_workers(TRANSCRIBE_WORKERS)
+    logger.info(f"Loading model: {MODEL_SIZE}")
+    _get_model(resolve_model_name(MODEL_SIZE))
+    
+    logger.info(f"Using {TRANSCRIBE_WORKERS} transcription worker(s)")
+    for _ in range(TRANSCRIBE_WORKERS):
+        threading.Thread(
+            target=transcription_worker,
+            args=(work_queue, queued, existing_transcripts),
+            daemon=True
+        ).start()
+    
+    # Rescan as soon as the downloader records a file instead of sleeping
+    changed = threading.Event()
+    if Observer is not None:
+        os.makedirs(TRACKING_DIR, exist_ok=True)
+        observer = Observer()
+        observer.schedule(DownloadedListHandler(changed), TRACKING_DIR)
+        observer.daemon = True
+        observer.start()
+        logger.info(f"Watching {DOWNLOADED_FILE} for new downloads")
+    
+    # Downloaded files without a transcript yet; finished ones are dropped,
+    # so each scan only touches outstanding work
+    # Maps filename -> stem, computed once when the file is first seen
+    pending: Dict[str, str] = {}
     while True:
-        # Get list of downloaded files
+        changed.clear()
+        # Get newly downloaded files
         downloaded_files = get_downloaded_files()
-        logger.info(f"Found {len(downloaded_files)} downloaded files to process")
+        for filename in downloaded_files:
+            if filename not in pending:
+                pending[filename] = os.path.splitext(filename)[0]
+        logger.info(f"Found {len(downloaded_files)} new downloaded files ({len(pending)} pending)")
         
-        if not downloaded_files:
+        if not pending:
             logger.info("No downloaded files found to transcribe, waiting...")
-            time.sleep(60)  # Wait a minute before checking again
+            changed.wait(RESCAN_INTERVAL)
             continue
         
-        # Process videos
-        successful = 0
-        failed = 0
-        for filename in downloaded_files:
-            video_path = os.path.join(DOWNLOAD_DIR, filename)
+        new_files = 0
+        for filename, stem in list(pending.items()):
+            if stem in existing_transcripts:
+                del pending[filename]
+                continue
+            # Failed files stay pending and are queued again on the next scan
+            if filename in queued:
+                continue
+            # Pick up transcripts created outside this process; only the
+            # pending names are checked, not the whole transcript directory
+            try:
+                transcript_exists = os.stat(f"{TRANSCRIPT_DIR}/{stem}.txt").st_size > 0
+            except FileNotFoundError:
+                transcript_exists = False
+            if transcript_exists:
+                existing_transcripts.add(stem)
+                del pending[filename]
+                continue
+            video_path = f"{DOWNLOAD_DIR}/{filename}"
             if not os.path.exists(video_path):
                 logger.warning(f"Video file {filename} not found, skipping")
                 continue
-                
-            if process_video(filename):
-                successful += 1
-            else:
-                failed += 1
+            queued.add(filename)
+            work_queue.put(filename)
+            new_files += 1
         
-        logger.info(f"Transcription batch complete. Successful: {successful}, Failed: {failed}")
-        time.sleep(60)  # Wait a minute before checking for new files
+        logger.info(f"Queued {new_files} new files for transcription ({work_queue.qsize()} waiting)")
+        changed.wait(RESCAN_INTERVAL)
 
 if __name__ == "__main__":
     main()